@@ -81,6 +81,24 @@ def test_join_with_v3io_table():
     assert termination_result == 42
 
 
+def test_join_with_v3io_table_concurrent_workers():
+    table_path = f'bigdata/test_join_with_v3io_table_concurrent_workers/{int(time.time_ns() / 1000)}'
+    asyncio.run(SetupKvTable().setup(table_path))
+    controller = build_flow([
+        Source(),
+        Map(lambda x: x + 1),
+        Filter(lambda x: x < 8),
+        JoinWithV3IOTable(lambda x: x.body, lambda x, y: y['secret'], table_path, parse_concurrency=2),
+        Reduce(0, lambda x, y: x + y)
+    ]).run()
+    for i in range(10):
+        controller.emit(i)
+
+    controller.terminate()
+    termination_result = controller.await_termination()
+    assert termination_result == 42
+
+
 def test_join_with_http():
     controller = build_flow([
         Source(),
@@ -1,6 +1,9 @@
 import asyncio
 import copy
+import operator
+from collections import deque
 from datetime import datetime
+from itertools import islice
 
 from .aggregation_utils import is_raw_aggregate, get_virtual_aggregation_func, get_dependant_aggregates
 from .dtypes import EmitEveryEvent, FixedWindows, EmitAfterPeriod, EmitAfterWindow, EmitAfterMaxEvent
@@ -167,6 +170,10 @@ class AggregateStore:
         return self.cache.keys()
 
 
+# Aggregations whose buckets can be combined in any grouping, so the closed buckets of each window are kept pre-aggregated
+_incremental_aggregations = {'sum': operator.add, 'count': operator.add, 'min': min, 'max': max}
+
+
 class AggregationBuckets:
     def __init__(self, name, aggregation, window, base_time, max_value):
         self.name = name
@@ -174,17 +181,45 @@ class AggregationBuckets:
         self.window = window
         self.max_value = max_value
         self.buckets = []
+        self.closed_buckets_aggregates = None
+        self.is_incremental = aggregation in _incremental_aggregations and not isinstance(window, FixedWindows)
         self.first_bucket_start_time = self.window.get_window_start_time_by_time(base_time)
         self.last_bucket_start_time = \
             self.first_bucket_start_time + (window.total_number_of_buckets - 1) * window.period_millis
 
         self.initialize_column()
 
+    # Buckets are kept in a ring of fixed size, so advancing the window only replaces the buckets that expired
     def initialize_column(self):
-        self.buckets = []
+        number_of_buckets = self.window.total_number_of_buckets
+        self.buckets = deque((AggregationValue(self.aggregation, self.max_value) for _ in range(number_of_buckets)),
+                             maxlen=number_of_buckets)
+        self.closed_buckets_aggregates = None
+
+    # Every bucket but the last one is closed. For each window, the closed buckets it spans are aggregated in an
+    # IncrementalSlidingAggregate, so that get_features only has to combine their aggregate with the last bucket.
+    def build_closed_buckets_aggregates(self):
+        combine = _incremental_aggregations[self.aggregation]
+        identity = AggregationValue(self.get_aggregation_for_aggregation()).get_default_value()
+        last_bucket_index = self.window.total_number_of_buckets - 1
+        self.closed_buckets_aggregates = []
+        number_of_buckets = 0
+        prev_windows_millis = 0
+        for window_millis, _ in self.window.windows:
+            number_of_buckets += int((window_millis - prev_windows_millis) / self.window.period_millis)
+            number_of_closed_buckets = min(number_of_buckets, last_bucket_index + 1) - 1
+            closed_buckets_aggregate = IncrementalSlidingAggregate(combine, identity, number_of_closed_buckets)
+            for bucket in islice(self.buckets, last_bucket_index - number_of_closed_buckets, last_bucket_index):
+                closed_buckets_aggregate.insert(bucket.get_value()[1])
+            self.closed_buckets_aggregates.append(closed_buckets_aggregate)
+            prev_windows_millis = window_millis
 
-        for _ in range(self.window.total_number_of_buckets):
-            self.buckets.append(AggregationValue(self.aggregation, self.max_value))
+    def close_buckets(self, number_of_buckets):
+        closed_values = [self.buckets[-1].get_value()[1]]
+        closed_values.extend(AggregationValue(self.aggregation).get_default_value() for _ in range(number_of_buckets - 1))
+        for closed_buckets_aggregate in self.closed_buckets_aggregates:
+            for value in closed_values:
+                closed_buckets_aggregate.insert(value)
 
     def get_or_advance_bucket_index_by_timestamp(self, timestamp):
         if timestamp < self.last_bucket_start_time + self.window.period_millis:
@@ -212,9 +247,11 @@ class AggregationBuckets:
             if buckets_to_advance > self.window.total_number_of_buckets:
                 self.initialize_column()
             else:
-                self.buckets = self.buckets[buckets_to_advance:]
+                if self.closed_buckets_aggregates is not None:
+                    self.close_buckets(buckets_to_advance)
+                # appending to a full ring drops its oldest bucket
                 for _ in range(buckets_to_advance):
-                    self.buckets.extend([AggregationValue(self.aggregation, self.max_value)])
+                    self.buckets.append(AggregationValue(self.aggregation, self.max_value))
 
             self.first_bucket_start_time = \
                 self.first_bucket_start_time + buckets_to_advance * self.window.period_millis
@@ -224,6 +261,9 @@ class AggregationBuckets:
     def aggregate(self, timestamp, value):
         index = self.get_or_advance_bucket_index_by_timestamp(timestamp)
         self.buckets[index].aggregate(timestamp, value)
+        # late data changes a closed bucket
+        if index != self.window.total_number_of_buckets - 1:
+            self.closed_buckets_aggregates = None
 
     def get_aggregation_for_aggregation(self):
         if self.aggregation == 'count':
@@ -231,9 +271,12 @@ class AggregationBuckets:
         return self.aggregation
 
     def get_features(self, timestamp):
+        current_time_bucket_index = self.get_bucket_index_by_timestamp(timestamp)
+        if self.is_incremental and current_time_bucket_index == self.window.total_number_of_buckets - 1:
+            return self.get_features_incrementally()
+
         result = {}
 
-        current_time_bucket_index = self.get_bucket_index_by_timestamp(timestamp)
         if isinstance(self.window, FixedWindows):
             current_time_bucket_index = self.get_bucket_index_by_timestamp(self.window.round_up_time_to_window(timestamp) - 1)
 
@@ -268,6 +311,16 @@ class AggregationBuckets:
 
         return result
 
+    def get_features_incrementally(self):
+        if self.closed_buckets_aggregates is None:
+            self.build_closed_buckets_aggregates()
+        result = {}
+        combine = _incremental_aggregations[self.aggregation]
+        last_bucket_value = self.buckets[-1].get_value()[1]
+        for (_, window_string), closed_buckets_aggregate in zip(self.window.windows, self.closed_buckets_aggregates):
+            result[f'{self.name}_{self.aggregation}_{window_string}'] = combine(last_bucket_value, closed_buckets_aggregate.query())
+        return result
+
 
 class VirtualAggregationBuckets:
     def __init__(self, name, aggregation, window, base_time, args):
@@ -381,3 +434,37 @@ class AggregationValue:
         if self.aggregation == 'first':
             value_time = self._first_time
         return value_time, self._value
+
+
+# Aggregates the last size values inserted, with an associative combine function, in amortized O(1) per insert and query
+# using two stacks. The front holds, for each of its values, the aggregate of that value and every value after it in the
+# front, while the back is aggregated as values are inserted.
+class IncrementalSlidingAggregate:
+    def __init__(self, combine, identity, size):
+        self._combine = combine
+        self._identity = identity
+        self._size = size
+        self._front = []
+        self._back = []
+        self._back_aggregate = identity
+
+    def insert(self, value):
+        if self._size == 0:
+            return
+        if len(self._front) + len(self._back) == self._size:
+            self._evict()
+        self._back.append(value)
+        self._back_aggregate = self._combine(self._back_aggregate, value)
+
+    def _evict(self):
+        if not self._front:
+            aggregate = self._identity
+            while self._back:
+                aggregate = self._combine(self._back.pop(), aggregate)
+                self._front.append(aggregate)
+            self._back_aggregate = self._identity
+        self._front.pop()
+
+    def query(self):
+        front_aggregate = self._front[-1] if self._front else self._identity
+        return self._combine(front_aggregate, self._back_aggregate)
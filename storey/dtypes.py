@@ -5,6 +5,8 @@ from .utils import parse_duration, bucketPerWindow, get_one_unit_of_duration
 
 
 class WindowBase:
+    __slots__ = ('window_millis', 'period_millis', 'window_str')
+
     def __init__(self, window, period, window_str):
         self.window_millis = window
         self.period_millis = period
@@ -12,6 +14,8 @@ class WindowBase:
 
 
 class FixedWindow(WindowBase):
+    __slots__ = ()
+
     def __init__(self, window):
         window_millis = parse_duration(window)
         WindowBase.__init__(self, window_millis, window_millis / bucketPerWindow, window)
@@ -30,6 +34,8 @@ class FixedWindow(WindowBase):
 
 
 class SlidingWindow(WindowBase):
+    __slots__ = ()
+
     def __init__(self, window, period):
         window_millis, period_millis = parse_duration(window), parse_duration(period)
         if not window_millis % period_millis == 0:
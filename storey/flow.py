@@ -2,21 +2,55 @@ import asyncio
 import base64
 import copy
 import csv
+import functools
 import json
+import operator
 import os
 import queue
-import re
 import threading
 from datetime import datetime, timezone
 import uuid
 import random
+from itertools import islice
 
 import aiofiles
 import aiohttp
+import orjson
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
 
 _termination_obj = object()
 
 
+def _new_event_loop():
+    if uvloop:
+        return uvloop.new_event_loop()
+    return asyncio.new_event_loop()
+
+
+# Same as asyncio.run, but on a uvloop event loop when uvloop is installed
+def _run_in_new_loop(coroutine):
+    loop = _new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        try:
+            remaining_tasks = asyncio.all_tasks(loop)
+            for task in remaining_tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*remaining_tasks, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            if hasattr(loop, 'shutdown_default_executor'):
+                loop.run_until_complete(loop.shutdown_default_executor())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+
 class FlowError(Exception):
     pass
 
@@ -26,10 +60,13 @@ class V3ioError(Exception):
 
 
 class Flow:
+    __slots__ = ('_outlets', '_full_event', '_termination_result_fn', '_loop')
+
     def __init__(self, full_event=False, termination_result_fn=lambda x, y: None):
         self._outlets = []
         self._full_event = full_event
         self._termination_result_fn = termination_result_fn
+        self._loop = None
 
     def to(self, outlet):
         self._outlets.append(outlet)
@@ -43,18 +80,18 @@ class Flow:
         raise NotImplementedError
 
     async def _do_downstream(self, event):
-        if not self._outlets:
+        outlets = self._outlets
+        if not outlets:
             return
         if event is _termination_obj:
-            termination_result = await self._outlets[0]._do(_termination_obj)
-            for i in range(1, len(self._outlets)):
-                termination_result = self._termination_result_fn(termination_result, await self._outlets[i]._do(_termination_obj))
+            termination_result = await outlets[0]._do(_termination_obj)
+            for i in range(1, len(outlets)):
+                termination_result = self._termination_result_fn(termination_result, await outlets[i]._do(_termination_obj))
             return termination_result
-        tasks = []
-        for i in range(len(self._outlets)):
-            tasks.append(asyncio.get_running_loop().create_task(self._outlets[i]._do(event)))
-        for task in tasks:
-            await task
+        if len(outlets) == 1:
+            await outlets[0]._do(event)
+            return
+        await asyncio.gather(*[outlet._do(event) for outlet in outlets])
 
     def _get_safe_event_or_body(self, event):
         if self._full_event:
@@ -114,7 +151,7 @@ class Event:
 
 class AwaitableResult:
     def __init__(self):
-        self._q = queue.Queue(1)
+        self._q = queue.SimpleQueue()
 
     def await_result(self):
         return self._q.get()
@@ -127,11 +164,13 @@ class AwaitableResult:
 
 
 class FlowController:
-    def __init__(self, emit_fn, await_termination_fn):
+    def __init__(self, emit_fn, await_termination_fn, emit_async_fn=None):
         self._emit_fn = emit_fn
         self._await_termination_fn = await_termination_fn
+        self._emit_async_fn = emit_async_fn
 
-    def emit(self, element, key=None, event_time=None, return_awaitable_result=False):
+    @staticmethod
+    def _build_event(element, key, event_time, return_awaitable_result):
         if event_time is None:
             event_time = datetime.now(timezone.utc)
         if hasattr(element, 'id'):
@@ -146,8 +185,19 @@ class FlowController:
         if return_awaitable_result:
             awaitable_result = AwaitableResult()
         event._awaitable_result = awaitable_result
+        return event
+
+    # Blocks while the buffer is full
+    def emit(self, element, key=None, event_time=None, return_awaitable_result=False):
+        event = self._build_event(element, key, event_time, return_awaitable_result)
         self._emit_fn(event)
-        return awaitable_result
+        return event._awaitable_result
+
+    # Emits from a coroutine on any event loop, without the thread pool hop of emit
+    async def emit_async(self, element, key=None, event_time=None, return_awaitable_result=False):
+        event = self._build_event(element, key, event_time, return_awaitable_result)
+        await self._emit_async_fn(event)
+        return event._awaitable_result
 
     def terminate(self):
         self._emit_fn(_termination_obj)
@@ -164,45 +214,113 @@ class FlowAwaiter:
         return self._await_termination_fn()
 
 
+_source_drain_batch_size = 256
+
+
 class Source(Flow):
     def __init__(self, buffer_size=1, **kwargs):
         super().__init__(**kwargs)
         if buffer_size <= 0:
             raise ValueError('Buffer size must be positive')
-        self._q = queue.Queue(buffer_size)
-        self._termination_q = queue.Queue(1)
+        self._buffer_size = buffer_size
+        # SimpleQueue is unbounded, so buffer_size is enforced by the producers taking a slot before every put
+        self._q = queue.SimpleQueue()
+        self._buffer_slots = threading.Semaphore(buffer_size)
+        self._async_q = None
+        self._loop_ready = threading.Event()
+        self._termination_q = queue.SimpleQueue()
         self._ex = None
 
     async def _run_loop(self):
         loop = asyncio.get_running_loop()
-        self._termination_future = asyncio.get_running_loop().create_future()
+        self._termination_future = loop.create_future()
+        self._async_q = asyncio.Queue(self._buffer_size)
+        self._loop = loop
+        self._loop_ready.set()
 
-        while True:
-            event = await loop.run_in_executor(None, self._q.get)
-            try:
-                termination_result = await self._do_downstream(event)
-                if event is _termination_obj:
-                    self._termination_future.set_result(termination_result)
-            except BaseException as ex:
-                self._ex = ex
-                if not self._q.empty():
-                    self._q.get()
-                self._termination_future.set_result(None)
-                break
+        drain_future = loop.run_in_executor(None, self._drain_queue)
+        drain_async_task = loop.create_task(self._drain_async_queue())
+        try:
+            while True:
+                done, _ = await asyncio.wait([drain_future, drain_async_task], return_when=asyncio.FIRST_COMPLETED)
+                # termination only ever comes through the sync queue, so events emitted with emit_async go first
+                events = []
+                if drain_async_task in done:
+                    events.extend(drain_async_task.result())
+                if drain_future in done:
+                    events.extend(drain_future.result())
+                for event in events:
+                    if event is _termination_obj:
+                        # events emitted with emit_async before terminate() may not have been drained yet
+                        while not self._async_q.empty():
+                            if not await self._do_event(self._async_q.get_nowait()):
+                                return
+                    if not await self._do_event(event):
+                        return
+                if drain_future in done:
+                    drain_future = loop.run_in_executor(None, self._drain_queue)
+                if drain_async_task in done:
+                    drain_async_task = loop.create_task(self._drain_async_queue())
+        finally:
+            drain_async_task.cancel()
+            if not drain_future.done():
+                # Release the executor thread, which is still blocked waiting on the queue
+                self._q.put(_termination_obj)
+
+    # Returns whether the loop should carry on
+    async def _do_event(self, event):
+        try:
+            termination_result = await self._do_downstream(event)
             if event is _termination_obj:
-                break
+                self._termination_future.set_result(termination_result)
+                return False
+            return True
+        except BaseException as ex:
+            self._ex = ex
+            # let a producer that is blocked on a full buffer through, so that it can raise the error
+            self._buffer_slots.release()
+            self._termination_future.set_result(None)
+            return False
+
+    async def _drain_async_queue(self):
+        events = [await self._async_q.get()]
+        while len(events) < _source_drain_batch_size and not self._async_q.empty():
+            events.append(self._async_q.get_nowait())
+        return events
+
+    # Blocks for the first event, then takes whatever else is already queued, so that the executor hop is paid once per batch
+    def _drain_queue(self):
+        events = [self._q.get()]
+        try:
+            while len(events) < _source_drain_batch_size:
+                events.append(self._q.get_nowait())
+        except queue.Empty:
+            pass
+        for _ in range(len(events)):
+            self._buffer_slots.release()
+        return events
 
     def _loop_thread_main(self):
-        asyncio.run(self._run_loop())
+        _run_in_new_loop(self._run_loop())
         self._termination_q.put(self._ex)
 
     def _raise_on_error(self, ex):
         if ex:
             raise FlowError('Flow execution terminated due to an error') from self._ex
 
-    def _emit(self, event):
+    async def _emit_async(self, event):
         self._raise_on_error(self._ex)
-        self._q.put(event)
+        if not self._loop_ready.is_set():
+            await asyncio.get_running_loop().run_in_executor(None, self._loop_ready.wait)
+        try:
+            if asyncio.get_running_loop() is self._loop:
+                await self._async_q.put(event)
+            else:
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._async_q.put(event), self._loop))
+        except asyncio.CancelledError:
+            # a pending put is cancelled when the flow's loop shuts down after an error
+            self._raise_on_error(self._ex)
+            raise
         self._raise_on_error(self._ex)
 
     def run(self):
@@ -211,11 +329,21 @@ class Source(Flow):
         thread = threading.Thread(target=self._loop_thread_main)
         thread.start()
 
+        acquire_buffer_slot = self._buffer_slots.acquire
+        put = self._q.put
+
+        # Errors that happen after the last emit are raised by await_termination
+        def emit(event):
+            if self._ex is not None:
+                self._raise_on_error(self._ex)
+            acquire_buffer_slot()
+            put(event)
+
         def raise_error_or_return_termination_result():
             self._raise_on_error(self._termination_q.get())
             return self._termination_future.result()
 
-        return FlowController(self._emit, raise_error_or_return_termination_result)
+        return FlowController(emit, raise_error_or_return_termination_result, self._emit_async)
 
 
 class AsyncAwaitableResult:
@@ -317,7 +445,7 @@ class ReadCSV(Flow):
         self._timestamp_field = timestamp_field
         self._timestamp_format = timestamp_format
 
-        self._termination_q = queue.Queue(1)
+        self._termination_q = queue.SimpleQueue()
         self._ex = None
 
         if not with_header and isinstance(key_field, str):
@@ -374,7 +502,7 @@ class ReadCSV(Flow):
             self._termination_future.set_result(None)
 
     def _loop_thread_main(self):
-        asyncio.run(self._run_loop())
+        _run_in_new_loop(self._run_loop())
         self._termination_q.put(self._ex)
 
     def _raise_on_error(self, ex):
@@ -395,6 +523,8 @@ class ReadCSV(Flow):
 
 
 class UnaryFunctionFlow(Flow):
+    __slots__ = ('_fn', '_is_async')
+
     def __init__(self, fn, **kwargs):
         super().__init__(**kwargs)
         if not callable(fn):
@@ -421,22 +551,134 @@ class UnaryFunctionFlow(Flow):
 
 
 class Map(UnaryFunctionFlow):
+    __slots__ = ()
+
     async def _do_internal(self, event, fn_result):
         mapped_event = self._user_fn_output_to_event(event, fn_result)
         await self._do_downstream(mapped_event)
 
 
 class Filter(UnaryFunctionFlow):
+    __slots__ = ()
+
     async def _do_internal(self, event, keep):
         if keep:
             await self._do_downstream(event)
 
 
+_flat_map_max_concurrency = 64
+
+
+# Delivers the elements of a FlatMap result downstream concurrently, at most _flat_map_max_concurrency at a time. Used only by
+# FlatMap(concurrent=True), since elements may reach downstream steps out of order.
+async def _do_flat_map_downstream(do_fn, fn_result):
+    fn_result = iter(fn_result)
+    while True:
+        chunk = list(islice(fn_result, _flat_map_max_concurrency))
+        if len(chunk) > 1:
+            await asyncio.gather(*[do_fn(element) for element in chunk])
+        elif chunk:
+            await do_fn(chunk[0])
+        if len(chunk) < _flat_map_max_concurrency:
+            return
+
+
+# With concurrent=True, the elements of each result are delivered downstream concurrently, and their order is not preserved
 class FlatMap(UnaryFunctionFlow):
+    __slots__ = ('_concurrent',)
+
+    def __init__(self, fn, concurrent=False, **kwargs):
+        super().__init__(fn, **kwargs)
+        self._concurrent = concurrent
+
     async def _do_internal(self, event, fn_result):
-        for fn_result_element in fn_result:
-            mapped_event = self._user_fn_output_to_event(event, fn_result_element)
-            await self._do_downstream(mapped_event)
+        if self._concurrent:
+            async def do_downstream(fn_result_element):
+                await self._do_downstream(self._user_fn_output_to_event(event, fn_result_element))
+
+            await _do_flat_map_downstream(do_downstream, fn_result)
+        else:
+            for fn_result_element in fn_result:
+                await self._do_downstream(self._user_fn_output_to_event(event, fn_result_element))
+
+
+# Generates the source of a coroutine that runs the given steps one after the other, with every step's function bound to a
+# global of its own. Each FlatMap starts a new segment, that its results are delivered to.
+def _generate_fused_steps_source(steps):
+    lines = ['async def _segment_0(event):']
+    segment = 0
+    for i, step in enumerate(steps):
+        fn_input = '_copy(event)' if step._full_event else 'event.body'
+        await_prefix = 'await ' if step._is_async else ''
+        lines.append(f'    fn_result = {await_prefix}_fn{i}({fn_input})')
+        if type(step) is Filter:
+            lines.append('    if not fn_result:')
+            lines.append('        return')
+        elif type(step) is Map:
+            if step._full_event:
+                lines.append('    event = fn_result')
+            else:
+                lines.append('    event = _copy(event)')
+                lines.append('    event.body = fn_result')
+        else:
+            segment += 1
+            if step._concurrent:
+                lines.append('    async def deliver(fn_result_element):')
+            else:
+                lines.append('    for fn_result_element in fn_result:')
+            if step._full_event:
+                lines.append(f'        await _segment_{segment}(fn_result_element)')
+            else:
+                lines.append('        mapped_event = _copy(event)')
+                lines.append('        mapped_event.body = fn_result_element')
+                lines.append(f'        await _segment_{segment}(mapped_event)')
+            if step._concurrent:
+                lines.append('    await _do_flat_map_downstream(deliver, fn_result)')
+            lines.append(f'async def _segment_{segment}(event):')
+    lines.append('    await _do_downstream(event)')
+    return '\n'.join(lines)
+
+
+# Runs a linear chain of Map, Filter and FlatMap steps as a single generated coroutine, without a hop between steps
+class _FusedUnaryFlow(Flow):
+    __slots__ = ('_do_steps',)
+
+    def __init__(self, steps):
+        super().__init__(termination_result_fn=steps[-1]._termination_result_fn)
+        namespace = {'_copy': copy.copy, '_do_flat_map_downstream': _do_flat_map_downstream, '_do_downstream': self._do_downstream}
+        for i, step in enumerate(steps):
+            namespace[f'_fn{i}'] = step._fn
+        exec(compile(_generate_fused_steps_source(steps), '<fused steps>', 'exec'), namespace)
+        self._do_steps = namespace['_segment_0']
+
+    async def _do(self, event):
+        if event is _termination_obj:
+            return await self._do_downstream(_termination_obj)
+        await self._do_steps(event)
+
+
+_fusable_step_types = (Map, Filter, FlatMap)
+
+
+def _is_fusable(step):
+    return not isinstance(step, list) and type(step) in _fusable_step_types and not step._outlets
+
+
+def _fuse_linear_steps(steps):
+    fused_steps = []
+    run = []
+    for step in steps + [None]:
+        if step is not None and _is_fusable(step):
+            run.append(step)
+            continue
+        if len(run) > 1:
+            fused_steps.append(_FusedUnaryFlow(run))
+        else:
+            fused_steps.extend(run)
+        run = []
+        if step is not None:
+            fused_steps.append(step)
+    return fused_steps
 
 
 class FunctionWithStateFlow(Flow):
@@ -483,26 +725,65 @@ class Complete(Flow):
         return termination_result
 
 
+# Reductions that fold a whole batch of values with a single call to a C builtin. Addition goes through functools.reduce rather
+# than sum(), which uses compensated float summation from Python 3.12 and would give results that differ from unbatched ones.
+_batch_reducers = (
+    (operator.add, lambda acc, values: functools.reduce(operator.add, values, acc)),
+    (min, lambda acc, values: min(acc, min(values))),
+    (max, lambda acc, values: max(acc, max(values))),
+)
+
+
 class Reduce(Flow):
-    def __init__(self, initial_value, fn, **kwargs):
+    __slots__ = ('_fn', '_is_async', '_result', '_batch_size', '_batch', '_batch_reducer', '_add_inline')
+
+    def __init__(self, initial_value, fn, batch_size=None, **kwargs):
         super().__init__(**kwargs)
         if not callable(fn):
             raise TypeError(f'Expected a callable, got {type(fn)}')
+        if batch_size is not None and batch_size <= 0:
+            raise ValueError('Batch size must be positive')
         self._is_async = asyncio.iscoroutinefunction(fn)
         self._fn = fn
         self._result = initial_value
+        self._batch_size = batch_size
+        self._batch = []
+        self._batch_reducer = None
+        # adding inline saves calling operator.add through a Python-level dispatch on every event
+        self._add_inline = fn is operator.add and not batch_size
+        if batch_size:
+            for op, batch_reducer in _batch_reducers:
+                if fn is op:
+                    self._batch_reducer = batch_reducer
+            if not self._batch_reducer:
+                raise ValueError('Batch size is only supported when fn is operator.add, min or max')
 
     def to(self, outlet):
         raise ValueError("Reduce is a terminal step. It cannot be piped further.")
 
+    def _reduce_batch(self):
+        if self._batch:
+            self._result = self._batch_reducer(self._result, self._batch)
+            self._batch = []
+
     async def _do(self, event):
         if event is _termination_obj:
+            if self._batch_reducer:
+                self._reduce_batch()
             return self._result
         else:
             if self._full_event:
                 elem = event
             else:
                 elem = event.body
+            if self._batch_reducer:
+                self._batch.append(elem)
+                if len(self._batch) >= self._batch_size:
+                    self._reduce_batch()
+                return
+            if self._add_inline:
+                self._result = self._result + elem
+                return
             res = self._fn(self._result, elem)
             if self._is_async:
                 res = await res
@@ -515,7 +796,7 @@ class NeedsV3ioAccess:
         if not webapi:
             raise ValueError('Missing webapi parameter or V3IO_API environment variable')
 
-        if not webapi.startswith('http://') and not webapi.startswith('https://'):
+        if not webapi.startswith(('http://', 'https://')):
             webapi = f'http://{webapi}'
 
         self._webapi_url = webapi
@@ -576,41 +857,82 @@ class HttpResponse:
         self.body = body
 
 
+# Joins every event with the response to an HTTP request built from it. Requests start as events arrive, and up to
+# max_in_flight of them wait in line for one of parse_concurrency workers to join their responses. Events are emitted in
+# order only when parse_concurrency is 1.
 class JoinWithHttp(Flow):
-    def __init__(self, request_builder, join_from_response, max_in_flight=8, **kwargs):
+    def __init__(self, request_builder, join_from_response, max_in_flight=64, parse_concurrency=1, **kwargs):
         Flow.__init__(self, **kwargs)
+        if parse_concurrency <= 0:
+            raise ValueError('Parse concurrency must be positive')
         self._request_builder = request_builder
         self._join_from_response = join_from_response
         self._max_in_flight = max_in_flight
+        self._parse_concurrency = parse_concurrency
 
         self._client_session = None
 
+    async def _send_request(self, req):
+        response = await self._client_session.request(req.method, req.url, headers=req.headers, data=req.body, ssl=False)
+        response_body = await response.text()
+        return HttpResponse(response.status, response_body)
+
+    async def _parse_worker(self):
+        while True:
+            job = await self._in_flight_q.get()
+            if job is _termination_obj:
+                return
+            event, request = job
+            response = await request
+            joined_element = self._join_from_response(event.body, response)
+            if joined_element is not None:
+                new_event = self._user_fn_output_to_event(event, joined_element)
+                await self._do_downstream(new_event)
+
     async def _worker(self):
+        workers = [self._loop.create_task(self._parse_worker()) for _ in range(self._parse_concurrency)]
         try:
-            while True:
-                job = await self._q.get()
-                if job is _termination_obj:
-                    break
-                event = job[0]
-                request = job[1]
-                response = await request
-                response_body = await response.text()
-                joined_element = self._join_from_response(event.body, HttpResponse(response.status, response_body))
-                if joined_element is not None:
-                    new_event = self._user_fn_output_to_event(event, joined_element)
-                    await self._do_downstream(new_event)
+            done, _ = await asyncio.wait(workers, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()
         except BaseException as ex:
-            if not self._q.empty():
-                await self._q.get()
+            self._worker_failed = True
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            while not self._in_flight_q.empty():
+                job = self._in_flight_q.get_nowait()
+                if job is not _termination_obj:
+                    job[1].cancel()
             raise ex
         finally:
             await self._client_session.close()
 
     def _lazy_init(self):
-        connector = aiohttp.TCPConnector()
+        # besides the requests waiting in line, each parse worker awaits one, and _do may hold one while it waits for room
+        connection_limit = self._max_in_flight + self._parse_concurrency + 1
+        connector = aiohttp.TCPConnector(limit=connection_limit, limit_per_host=connection_limit, ttl_dns_cache=300,
+                                         force_close=False)
         self._client_session = aiohttp.ClientSession(connector=connector)
-        self._q = asyncio.queues.Queue(self._max_in_flight)
-        self._worker_awaitable = asyncio.get_running_loop().create_task(self._worker())
+        self._in_flight_q = asyncio.queues.Queue(self._max_in_flight)
+        self._worker_failed = False
+        self._loop = asyncio.get_running_loop()
+        self._worker_awaitable = self._loop.create_task(self._worker())
+
+    # Puts a job in line, without blocking on a full queue once the worker has terminated
+    async def _put_in_flight(self, job):
+        if self._in_flight_q.full():
+            put = self._loop.create_task(self._in_flight_q.put(job))
+            await asyncio.wait([put, self._worker_awaitable], return_when=asyncio.FIRST_COMPLETED)
+            put.cancel()
+        else:
+            self._in_flight_q.put_nowait(job)
+        # nothing takes jobs off the queue once the worker has failed, so their requests would never be awaited
+        if self._worker_failed:
+            if job is not _termination_obj:
+                job[1].cancel()
+            await self._worker_awaitable
+            raise FlowError("JoinWithHttp worker has already terminated")
 
     async def _do(self, event):
         if not self._client_session:
@@ -621,58 +943,63 @@ class JoinWithHttp(Flow):
             raise FlowError("JoinWithHttp worker has already terminated")
 
         if event is _termination_obj:
-            await self._q.put(_termination_obj)
+            for _ in range(self._parse_concurrency):
+                await self._put_in_flight(_termination_obj)
             await self._worker_awaitable
             return await self._do_downstream(_termination_obj)
         else:
-            req = self._request_builder(event)
-            request = self._client_session.request(req.method, req.url, headers=req.headers, data=req.body, ssl=False)
-            await self._q.put((event, asyncio.get_running_loop().create_task(request)))
+            request = self._loop.create_task(self._send_request(self._request_builder(event)))
+            await self._put_in_flight((event, request))
             if self._worker_awaitable.done():
                 await self._worker_awaitable
 
 
-_non_int_char_pattern = re.compile(r"[^-0-9]")
-
-
-def _v3io_parse_get_item_response(response_body):
-    response_object = json.loads(response_body)["Item"]
+def _v3io_parse_get_item_response(response_body, attribute_types=None):
+    response_object = orjson.loads(response_body)["Item"]
     for name, type_to_value in response_object.items():
-        val = None
-        for typ, value in type_to_value.items():
-            if typ == 'S' or typ == 'BOOL':
-                val = value
-            elif typ == 'N':
-                if _non_int_char_pattern.search(value):
-                    val = float(value)
-                else:
-                    val = int(value)
-            elif typ == 'B':
-                val = base64.b64decode(value)
-            elif typ == 'TS':
-                splits = value.split(':', 1)
-                secs = int(splits[0])
-                nanosecs = int(splits[1])
-                val = datetime.utcfromtimestamp(secs + nanosecs / 1000000000)
+        # V3IO tags every attribute with exactly one type
+        if len(type_to_value) != 1:
+            raise V3ioError(f'Attribute {name} in get item response has {len(type_to_value)} types, expected one')
+        (typ, value), = type_to_value.items()
+        if typ == 'S' or typ == 'BOOL':
+            val = value
+        elif typ == 'N':
+            number_type = attribute_types.get(name) if attribute_types else None
+            if number_type:
+                val = number_type(value)
             else:
-                raise V3ioError(f'Type {typ} in get item response is not supported')
+                try:
+                    val = int(value)
+                except ValueError:
+                    val = float(value)
+        elif typ == 'B':
+            val = base64.b64decode(value)
+        elif typ == 'TS':
+            splits = value.split(':', 1)
+            secs = int(splits[0])
+            nanosecs = int(splits[1])
+            val = datetime.utcfromtimestamp(secs + nanosecs / 1000000000)
+        else:
+            raise V3ioError(f'Type {typ} in get item response is not supported')
         response_object[name] = val
     return response_object
 
 
 class JoinWithV3IOTable(JoinWithHttp, NeedsV3ioAccess):
 
-    def __init__(self, key_extractor, join_function, table_path, attributes='*', webapi=None, access_key=None, **kwargs):
+    def __init__(self, key_extractor, join_function, table_path, attributes='*', webapi=None, access_key=None, attribute_types=None,
+                 **kwargs):
         NeedsV3ioAccess.__init__(self, webapi, access_key)
         request_body = json.dumps({'AttributesToGet': attributes})
+        url_prefix = f'{self._webapi_url}/{table_path}/'
+        headers = self._get_item_headers
 
         def request_builder(event):
-            key = key_extractor(event)
-            return HttpRequest('PUT', f'{self._webapi_url}/{table_path}/{key}', request_body, self._get_item_headers)
+            return HttpRequest('PUT', url_prefix + str(key_extractor(event)), request_body, headers)
 
         def join_from_response(element, response):
             if response.status == 200:
-                response_object = _v3io_parse_get_item_response(response.body)
+                response_object = _v3io_parse_get_item_response(response.body, attribute_types)
                 return join_function(element, response_object)
             elif response.status == 404:
                 return None
@@ -737,7 +1064,7 @@ class WriteToV3IOStream(Flow, NeedsV3ioAccess):
         request = self._client_session.request('POST', f'{self._webapi_url}/{self.stream_path}/',
                                                headers=self._put_records_headers,
                                                data=request_body, ssl=False)
-        in_flight_reqs[shard_id] = asyncio.get_running_loop().create_task(request)
+        in_flight_reqs[shard_id] = self._loop.create_task(request)
 
     async def _worker(self):
         try:
@@ -798,7 +1125,8 @@ class WriteToV3IOStream(Flow, NeedsV3ioAccess):
             self._sharding_func = f
 
         self._q = asyncio.queues.Queue(self._batch_size * self._shard_count)
-        self._worker_awaitable = asyncio.get_running_loop().create_task(self._worker())
+        self._loop = asyncio.get_running_loop()
+        self._worker_awaitable = self._loop.create_task(self._worker())
 
     async def _do(self, event):
         if not self._client_session:
@@ -821,6 +1149,7 @@ class WriteToV3IOStream(Flow, NeedsV3ioAccess):
 def build_flow(steps):
     if len(steps) == 0:
         raise ValueError('Cannot build an empty flow')
+    steps = _fuse_linear_steps(steps)
     cur_step = steps[0]
     for next_step in steps[1:]:
         if isinstance(next_step, list):
@@ -2,13 +2,14 @@ import base64
 import json
 from datetime import datetime
 
-from .flow import _v3io_parse_get_item_response
+from .flow import _v3io_parse_get_item_response, JoinWithV3IOTable, V3ioError
 
 
 def test_v3io_parse_get_item_response():
     request = json.dumps({'Item': {
         'int': {'N': '55'},
         'float': {'N': '55.4'},
+        'exponent': {'N': '-1e5'},
         'string': {'S': 'der die das'},
         'boolean': {'BOOL': True},
         'blob': {'B': base64.b64encode(b'message in a bottle').decode('ascii')},
@@ -18,9 +19,37 @@ def test_v3io_parse_get_item_response():
     expected = {
         'int': 55,
         'float': 55.4,
+        'exponent': -100000.0,
         'string': 'der die das',
         'boolean': True,
         'blob': b'message in a bottle',
         'timestamp': datetime(2020, 7, 9, 10, 13, 16, 124)
     }
     assert response == expected
+
+
+def test_v3io_parse_get_item_response_with_attribute_types():
+    request = json.dumps({'Item': {
+        'int': {'N': '55'},
+        'float': {'N': '55'},
+        'string': {'N': '55'},
+        'other': {'N': '.5'},
+    }})
+    response = _v3io_parse_get_item_response(request, {'float': float, 'string': str})
+    assert response == {'int': 55, 'float': 55.0, 'string': '55', 'other': 0.5}
+    assert isinstance(response['float'], float)
+
+
+def test_v3io_parse_get_item_response_with_empty_type():
+    request = json.dumps({'Item': {'int': {'N': '55'}, 'empty': {}}})
+    try:
+        _v3io_parse_get_item_response(request)
+        assert False
+    except V3ioError:
+        pass
+
+
+def test_join_with_v3io_table_positional_access_parameters():
+    join = JoinWithV3IOTable(lambda event: event.key, lambda x, y: y, 'tbl', '*', 'http://host:8081', 'key')
+    assert join._webapi_url == 'http://host:8081'
+    assert join._get_item_headers['X-v3io-session-key'] == 'key'
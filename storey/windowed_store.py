@@ -1,4 +1,5 @@
 import asyncio
+from collections import deque
 from datetime import datetime
 import copy
 
@@ -109,10 +110,11 @@ class WindowedStoreElement:
     def get_column_name(self, column, aggregation):
         return f'{column}_{aggregation}_{self.window.window_str}'
 
+    # Buckets are kept in a ring of fixed size, so advancing the window only replaces the buckets that expired
     def initialize_column(self, column):
-        self.features[column] = []
-        for _ in range(self.window.get_total_number_of_buckets()):
-            self.features[column].append(WindowBucket(self.late_data_handling))
+        number_of_buckets = self.window.get_total_number_of_buckets()
+        self.features[column] = deque((WindowBucket(self.late_data_handling) for _ in range(number_of_buckets)),
+                                      maxlen=number_of_buckets)
 
     def get_or_advance_bucket_index_by_timestamp(self, timestamp):
         if timestamp < self.last_bucket_start_time + self.window.period_millis:
@@ -134,9 +136,9 @@ class WindowedStoreElement:
                     self.initialize_column(column)
             else:
                 for column in self.features:
-                    self.features[column] = self.features[column][buckets_to_advnace:]
+                    # appending to a full ring drops its oldest bucket
                     for _ in range(buckets_to_advnace):
-                        self.features[column].extend([WindowBucket(self.late_data_handling)])
+                        self.features[column].append(WindowBucket(self.late_data_handling))
 
             self.first_bucket_start_time = \
                 self.first_bucket_start_time + buckets_to_advnace * self.window.period_millis
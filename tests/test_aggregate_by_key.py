@@ -362,3 +362,66 @@ def test_emit_max_event_sliding_window_multiple_keys_aggregation_flow():
 
     assert actual == expected_results, \
         f'actual did not match expected. \n actual: {actual} \n expected: {expected_results}'
+
+
+def test_sliding_window_advancing_past_several_buckets_flow():
+    controller = build_flow([
+        Source(),
+        AggregateByKey([FieldAggregator("number_of_stuff", "col1", ["sum", "count", "min", "max"],
+                                        SlidingWindows(['1h', '2h'], '10m'))],
+                       'table'),
+        Reduce([], lambda acc, x: append_return(acc, x)),
+    ]).run()
+
+    # steps of 35 minutes advance the 12 buckets by several at a time, and the 5 hour gap advances past all of them
+    minutes = [0, 35, 70, 105, 140, 175, 210, 245, 545, 555, 590, 625, 660]
+    for i, minute in enumerate(minutes):
+        controller.emit({'col1': i}, 'tal', test_base_time + timedelta(minutes=minute))
+
+    controller.terminate()
+    actual = controller.await_termination()
+    expected_results = []
+    for i, minute in enumerate(minutes):
+        expected = {'col1': i}
+        for window_string, number_of_buckets in [('1h', 6), ('2h', 12)]:
+            values = [j for j in range(i + 1) if minute // 10 - number_of_buckets < minutes[j] // 10]
+            expected[f'number_of_stuff_sum_{window_string}'] = sum(values)
+            expected[f'number_of_stuff_count_{window_string}'] = len(values)
+            expected[f'number_of_stuff_min_{window_string}'] = min(values)
+            expected[f'number_of_stuff_max_{window_string}'] = max(values)
+        expected_results.append(expected)
+
+    assert actual == expected_results, \
+        f'actual did not match expected. \n actual: {actual} \n expected: {expected_results}'
+
+
+def test_sliding_window_late_data_after_advance_flow():
+    controller = build_flow([
+        Source(),
+        AggregateByKey([FieldAggregator("number_of_stuff", "col1", ["sum", "count", "min", "max"],
+                                        SlidingWindows(['1h', '2h'], '10m'))],
+                       'table'),
+        Reduce([], lambda acc, x: append_return(acc, x)),
+    ]).run()
+
+    # the event at minute 100 arrives after the window advanced to minute 130, and lands in one of its older buckets
+    minutes = [0, 45, 130, 100, 135, 140]
+    for i, minute in enumerate(minutes):
+        controller.emit({'col1': i}, 'tal', test_base_time + timedelta(minutes=minute))
+
+    controller.terminate()
+    actual = controller.await_termination()
+    values_in_windows = [([0], [0]), ([0, 1], [0, 1]), ([2], [1, 2]), ([3], [1, 3]), ([2, 3, 4], [1, 2, 3, 4]),
+                         ([2, 3, 4, 5], [1, 2, 3, 4, 5])]
+    expected_results = []
+    for i, windows_values in enumerate(values_in_windows):
+        expected = {'col1': i}
+        for window_string, values in zip(['1h', '2h'], windows_values):
+            expected[f'number_of_stuff_sum_{window_string}'] = sum(values)
+            expected[f'number_of_stuff_count_{window_string}'] = len(values)
+            expected[f'number_of_stuff_min_{window_string}'] = min(values)
+            expected[f'number_of_stuff_max_{window_string}'] = max(values)
+        expected_results.append(expected)
+
+    assert actual == expected_results, \
+        f'actual did not match expected. \n actual: {actual} \n expected: {expected_results}'
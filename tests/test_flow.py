@@ -1,7 +1,14 @@
 import asyncio
+import operator
+import random
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 
-from storey import build_flow, Source, Map, Filter, FlatMap, Reduce, FlowError, MapWithState, ReadCSV, Complete, AsyncSource, Choice, Event
+from aiohttp import web
+
+from storey import build_flow, Source, Map, Filter, FlatMap, Reduce, FlowError, MapWithState, ReadCSV, Complete, AsyncSource, Choice, \
+    Event, JoinWithHttp, HttpRequest
 
 
 class ATestException(Exception):
@@ -38,6 +45,208 @@ def test_functional_flow():
     assert termination_result == 3300
 
 
+def test_functional_flow_with_large_buffer():
+    controller = build_flow([
+        Source(buffer_size=1000),
+        Map(lambda x: x + 1),
+        Filter(lambda x: x < 3),
+        FlatMap(lambda x: [x, x * 10]),
+        Reduce(0, lambda acc, x: acc + x),
+    ]).run()
+
+    for _ in range(100):
+        for i in range(10):
+            controller.emit(i)
+    controller.terminate()
+    termination_result = controller.await_termination()
+    assert termination_result == 3300
+
+
+def test_fused_flow_with_full_event_and_async_step():
+    async def async_double(x):
+        return x * 2
+
+    def incr_key(event):
+        event.key = event.key + 1
+        return event
+
+    controller = build_flow([
+        Source(),
+        Map(lambda x: x + 1),
+        Map(incr_key, full_event=True),
+        Filter(lambda event: event.key % 2 == 0, full_event=True),
+        Map(async_double),
+        FlatMap(lambda x: [x, x * 10]),
+        Filter(lambda x: x < 100),
+        Reduce([], lambda acc, event: acc + [(event.key, event.body)], full_event=True),
+    ]).run()
+
+    for i in range(10):
+        controller.emit(i, key=i)
+    controller.terminate()
+    termination_result = controller.await_termination()
+    assert termination_result == [(2, 4), (2, 40), (4, 8), (4, 80), (6, 12), (8, 16), (10, 20)]
+
+
+def test_emit_async():
+    controller = build_flow([
+        Source(buffer_size=10),
+        Map(lambda x: x + 1),
+        Reduce(0, lambda acc, x: acc + x),
+    ]).run()
+
+    async def emit_all():
+        for i in range(100):
+            await controller.emit_async(i)
+
+    asyncio.run(emit_all())
+    for i in range(100):
+        controller.emit(i)
+    controller.terminate()
+    termination_result = controller.await_termination()
+    assert termination_result == 10100
+
+
+def test_emit_async_then_terminate():
+    async def sleep_and_return(x):
+        await asyncio.sleep(0.001)
+        return x
+
+    for _ in range(5):
+        controller = build_flow([
+            Source(buffer_size=10),
+            Map(sleep_and_return),
+            Reduce(0, lambda acc, x: acc + 1),
+        ]).run()
+
+        async def emit_all():
+            for i in range(100):
+                await controller.emit_async(i)
+
+        asyncio.run(emit_all())
+        controller.terminate()
+        termination_result = controller.await_termination()
+        assert termination_result == 100
+
+
+def test_error_emit_async():
+    controller = build_flow([
+        Source(),
+        Map(RaiseEx(500).raise_ex),
+        Reduce(0, lambda acc, x: acc + x),
+    ]).run()
+
+    async def emit_all():
+        for i in range(1000):
+            await controller.emit_async(i)
+
+    try:
+        asyncio.run(emit_all())
+        assert False
+    except FlowError as flow_ex:
+        assert isinstance(flow_ex.__cause__, ATestException)
+
+
+def test_batched_reduce():
+    reduces = [Reduce(0, operator.add, batch_size=16), Reduce(1000, min, batch_size=16), Reduce(0, max, batch_size=16)]
+    results = []
+    for reduce in reduces:
+        controller = build_flow([
+            Source(),
+            Map(lambda x: x + 1),
+            reduce,
+        ]).run()
+        for i in range(100):
+            controller.emit(i)
+        controller.terminate()
+        results.append(controller.await_termination())
+    assert results == [5050, 1, 100]
+
+
+def test_batched_reduce_float_sum_matches_unbatched():
+    values = [0.1] * 10 + [1e16, 1.0, -1e16]
+    results = []
+    for reduce in [Reduce(0.0, operator.add), Reduce(0.0, operator.add, batch_size=4)]:
+        controller = build_flow([Source(), reduce]).run()
+        for value in values:
+            controller.emit(value)
+        controller.terminate()
+        results.append(controller.await_termination())
+    assert results[0] == results[1]
+
+
+def test_batched_reduce_unsupported_fn():
+    try:
+        Reduce(0, lambda acc, x: acc + x, batch_size=16)
+        assert False
+    except ValueError:
+        pass
+
+
+def test_reduce_with_operator_add():
+    controller = build_flow([
+        Source(),
+        Map(lambda x: str(x)),
+        Reduce('', operator.add),
+    ]).run()
+
+    for i in range(10):
+        controller.emit(i)
+    controller.terminate()
+    termination_result = controller.await_termination()
+    assert termination_result == '0123456789'
+
+
+def test_flat_map_large_expansion():
+    for steps in [[FlatMap(lambda x: range(x * 100, x * 100 + 100))],
+                  [FlatMap(lambda x: (y for y in range(x * 100, x * 100 + 100))), Map(lambda x: x)]]:
+        controller = build_flow([Source()] + steps + [Reduce([], append_and_return)]).run()
+
+        for i in range(3):
+            controller.emit(i)
+        controller.terminate()
+        termination_result = controller.await_termination()
+        assert termination_result == list(range(300))
+
+
+def test_flat_map_concurrent():
+    for steps in [[FlatMap(lambda x: range(x * 100, x * 100 + 100), concurrent=True)],
+                  [FlatMap(lambda x: range(x * 100, x * 100 + 100), concurrent=True), Map(lambda x: x)]]:
+        controller = build_flow([Source()] + steps + [Reduce([], append_and_return)]).run()
+
+        for i in range(3):
+            controller.emit(i)
+        controller.terminate()
+        termination_result = controller.await_termination()
+        assert sorted(termination_result) == list(range(300))
+
+
+def test_flat_map_preserves_order():
+    async def sleep_randomly(x):
+        await asyncio.sleep(random.random() / 1000)
+        return x
+
+    for steps in [[FlatMap(lambda x: range(x * 10, x * 10 + 10)), Map(sleep_randomly)],
+                  [FlatMap(lambda x: range(x * 10, x * 10 + 10)), Map(sleep_randomly), Filter(lambda x: True)]]:
+        controller = build_flow([Source()] + steps + [Reduce([], append_and_return)]).run()
+
+        for i in range(10):
+            controller.emit(i)
+        controller.terminate()
+        termination_result = controller.await_termination()
+        assert termination_result == list(range(100))
+
+    source = Source()
+    source.to(FlatMap(lambda x: range(x * 10, x * 10 + 10))).to(Map(sleep_randomly)).to(Reduce([], append_and_return))
+    controller = source.run()
+
+    for i in range(10):
+        controller.emit(i)
+    controller.terminate()
+    termination_result = controller.await_termination()
+    assert termination_result == list(range(100))
+
+
 def test_csv_reader():
     controller = build_flow([
         ReadCSV('tests/test.csv', with_header=True),
@@ -338,3 +547,148 @@ def test_metadata_immutability():
     assert event.body == 'original body'
     assert result.key == 'new key'
     assert result.body == 'new body'
+
+
+# Serves every request with handler on a local port, from a loop on a thread of its own
+@contextmanager
+def http_server(handler):
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    runner = None
+
+    async def start():
+        nonlocal runner
+        app = web.Application()
+        app.router.add_route('*', '/{key}', handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', 0).start()
+        started.set()
+
+    thread = threading.Thread(target=loop.run_forever)
+    thread.start()
+    asyncio.run_coroutine_threadsafe(start(), loop)
+    started.wait()
+    try:
+        yield f'http://127.0.0.1:{runner.addresses[0][1]}'
+    finally:
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+async def echo_key(request):
+    return web.Response(text=request.match_info['key'])
+
+
+def test_join_with_http_error():
+    def join_from_response(element, response):
+        if int(response.body) == 19:
+            raise ATestException('test')
+        return element
+
+    with http_server(echo_key) as url:
+        controller = build_flow([
+            Source(buffer_size=100),
+            JoinWithHttp(lambda event: HttpRequest('GET', f'{url}/{event.body}', ''), join_from_response),
+            Reduce(0, lambda acc, x: acc + x),
+        ]).run()
+
+        try:
+            for i in range(100):
+                controller.emit(i)
+            controller.terminate()
+            controller.await_termination()
+            assert False
+        except FlowError as flow_ex:
+            assert isinstance(flow_ex.__cause__, ATestException)
+
+
+async def echo_key_after_random_delay(request):
+    await asyncio.sleep(random.random() / 100)
+    return web.Response(text=request.match_info['key'])
+
+
+def test_join_with_http_preserves_order():
+    with http_server(echo_key_after_random_delay) as url:
+        controller = build_flow([
+            Source(),
+            JoinWithHttp(lambda event: HttpRequest('GET', f'{url}/{event.body}', ''),
+                         lambda element, response: int(response.body), max_in_flight=8),
+            Reduce([], append_and_return),
+        ]).run()
+
+        for i in range(100):
+            controller.emit(i)
+        controller.terminate()
+        termination_result = controller.await_termination()
+        assert termination_result == list(range(100))
+
+
+def test_join_with_http_requests_overlap():
+    in_handler = 0
+    max_in_handler = 0
+
+    async def count_concurrent_requests(request):
+        nonlocal in_handler, max_in_handler
+        in_handler += 1
+        max_in_handler = max(max_in_handler, in_handler)
+        await asyncio.sleep(0.01)
+        in_handler -= 1
+        return web.Response(text=request.match_info['key'])
+
+    with http_server(count_concurrent_requests) as url:
+        controller = build_flow([
+            Source(),
+            JoinWithHttp(lambda event: HttpRequest('GET', f'{url}/{event.body}', ''),
+                         lambda element, response: int(response.body), max_in_flight=8),
+            Reduce(0, lambda acc, x: acc + x),
+        ]).run()
+
+        for i in range(32):
+            controller.emit(i)
+        controller.terminate()
+        termination_result = controller.await_termination()
+        assert termination_result == 496
+        assert 1 < max_in_handler <= 10
+
+
+def test_join_with_http_concurrent_requests_and_parsing():
+    with http_server(echo_key_after_random_delay) as url:
+        controller = build_flow([
+            Source(),
+            JoinWithHttp(lambda event: HttpRequest('GET', f'{url}/{event.body}', ''),
+                         lambda element, response: int(response.body), parse_concurrency=2),
+            Reduce(0, lambda acc, x: acc + x),
+        ]).run()
+
+        for i in range(100):
+            controller.emit(i)
+        controller.terminate()
+        termination_result = controller.await_termination()
+        assert termination_result == 4950
+
+
+def test_join_with_http_concurrent_error():
+    def join_from_response(element, response):
+        if int(response.body) == 19:
+            raise ATestException('test')
+        return element
+
+    with http_server(echo_key_after_random_delay) as url:
+        controller = build_flow([
+            Source(buffer_size=100),
+            JoinWithHttp(lambda event: HttpRequest('GET', f'{url}/{event.body}', ''), join_from_response,
+                         max_in_flight=8, parse_concurrency=2),
+            Reduce(0, lambda acc, x: acc + x),
+        ]).run()
+
+        try:
+            for i in range(100):
+                controller.emit(i)
+            controller.terminate()
+            controller.await_termination()
+            assert False
+        except FlowError as flow_ex:
+            assert isinstance(flow_ex.__cause__, ATestException)
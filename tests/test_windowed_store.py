@@ -2,7 +2,7 @@ from datetime import datetime, timedelta
 
 from storey import build_flow, Source, Filter, Reduce
 from storey.dtypes import EmissionType, SlidingWindow
-from storey.windowed_store import EmitAfterMaxEvent, Window
+from storey.windowed_store import EmitAfterMaxEvent, Window, WindowedStoreElement
 
 
 def append_return(lst, x):
@@ -55,3 +55,29 @@ def test_windowed_flow():
 
     validate_window(expected_window_1, window_list[0])
     validate_window(expected_window_2, window_list[1])
+
+
+def test_windowed_store_element_advancing_past_several_buckets():
+    # 6 buckets of 5 minutes
+    element = WindowedStoreElement('key', SlidingWindow('30m', '5m'), None)
+    base_time = element.first_bucket_start_time
+    minute = 60 * 1000
+
+    def bucket_values():
+        return [[v for _, v in bucket.data] for bucket in element.features['col1']]
+
+    element.add({'col1': 1}, base_time + 1 * minute)
+    element.add({'col1': 12}, base_time + 12 * minute)
+    element.add({'col1': 17}, base_time + 17 * minute)
+    assert bucket_values() == [[1], [], [12], [17], [], []]
+
+    element.add({'col1': 40}, base_time + 40 * minute)
+    assert bucket_values() == [[17], [], [], [], [], [40]]
+    assert element.first_bucket_start_time == base_time + 15 * minute
+
+    element.add({'col1': 70}, base_time + 70 * minute)
+    assert bucket_values() == [[], [], [], [], [], [70]]
+
+    element.add({'col1': 200}, base_time + 200 * minute)
+    assert bucket_values() == [[], [], [], [], [], [200]]
+    assert element.first_bucket_start_time == base_time + 175 * minute